@@ -7,8 +7,14 @@ Architecture:
 """
 
 import os
+import re
 import sys
 import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Set PyTorch CUDA memory allocation before vLLM initializes CUDA
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:128")
+
 from vllm import LLM, SamplingParams
 
 # Import all layers
@@ -17,9 +23,6 @@ from memory_layer import MemoryLayer
 from system_actions import SystemActions
 from orchestrator import Orchestrator
 
-# Set PyTorch memory allocation
-os.environ["PYTORCH_ALLOC_CONF"] = "expandable_segments:True"
-
 
 class JarvisAssistant:
     """Main Jarvis assistant coordinating all layers."""
@@ -30,28 +33,48 @@ class JarvisAssistant:
         print("Initializing Jarvis Assistant")
         print("=" * 60)
         
-        # Initialize Voice Interface (Whisper/Piper)
-        print("\n[1/5] Initializing Voice Interface...")
-        self.voice = VoiceInterface(wake_word="hey jarvis")
-        
-        # Initialize Memory Layer (Chroma)
-        print("\n[2/5] Initializing Memory Layer...")
-        self.memory = MemoryLayer()
+        # Only MemoryLayer overlaps with the other loads. Whisper must be on the GPU
+        # before vLLM profiles device memory, so VoiceInterface finishes first; vLLM
+        # then loads on the main thread while MemoryLayer keeps loading in a worker.
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            # Initialize Voice Interface (Whisper/Piper)
+            print("\n[1/5] Initializing Voice Interface...")
+            voice_future = pool.submit(VoiceInterface, wake_word="hey jarvis")
+            
+            # Initialize Memory Layer (Chroma)
+            print("\n[2/5] Initializing Memory Layer...")
+            memory_future = pool.submit(MemoryLayer)
+            
+            # Initialize System Actions
+            print("\n[3/5] Initializing System Actions...")
+            self.actions = SystemActions()
+            
+            # Wait for Whisper's GPU allocation to settle
+            self.voice = voice_future.result()
+            
+            # Initialize LLM Core (vLLM)
+            print("\n[4/5] Initializing LLM Core (vLLM)...")
+            self.llm = self._init_llm()
+            
+            self.memory = memory_future.result()
         
-        # Initialize System Actions
-        print("\n[3/5] Initializing System Actions...")
-        self.actions = SystemActions()
+        # Keyword dispatch for the fallback command handler: (keywords, action, default message)
+        self._keyword_map = [
+            (("open", "cursor"), self.actions.open_cursor, "Opening Cursor"),
+            (("open", "browser"), self.actions.open_browser, "Opening browser"),
+            (("what", "time"), self.actions.get_time, "I don't know the time"),
+        ]
         
-        # Initialize LLM Core (vLLM)
-        print("\n[4/5] Initializing LLM Core (vLLM)...")
-        self.llm = self._init_llm()
+        # Background worker for memory writes, overlapping them with TTS
+        self.executor = ThreadPoolExecutor(max_workers=2)
         
         # Initialize Orchestrator (LangChain)
         print("\n[5/5] Initializing Orchestrator...")
         self.orchestrator = Orchestrator(
             llm=self.llm,
             memory_layer=self.memory,
-            system_actions=self.actions
+            system_actions=self.actions,
+            executor=self.executor
         )
         
         print("\n" + "=" * 60)
@@ -62,12 +85,17 @@ class JarvisAssistant:
         """Initialize the vLLM model."""
         try:
             llm = LLM(
-                model="Qwen/Qwen2.5-3B-Instruct",
+                model="Qwen/Qwen2.5-3B-Instruct-AWQ",
+                quantization="awq_marlin",
                 max_model_len=2048,
-                gpu_memory_utilization=0.85,
+                gpu_memory_utilization=0.55,  # Leave room for Whisper alongside ~2GB of INT4 weights
                 tensor_parallel_size=1,
                 trust_remote_code=True,
-                dtype="bfloat16",
+                dtype="float16",
+                enable_prefix_caching=True,  # Reuse KV cache for the static system prompt
+                enforce_eager=False,  # Capture CUDA graphs to cut per-token launch overhead
+                max_num_seqs=4,  # Single-user assistant; avoids capturing graphs for large batches
+                max_num_batched_tokens=2048,
             )
             print("✓ LLM Core loaded successfully")
             return llm
@@ -112,20 +140,19 @@ class JarvisAssistant:
             self._handle_simple_command(command)
     
     def _handle_simple_command(self, command: str):
-        """Simple command handler fallback when LLM is not available."""
-        command_lower = command.lower()
+        """Simple command handler fallback when LLM is not available.
         
-        if "open cursor" in command_lower:
-            result = self.actions.open_cursor()
-            self.voice.speak(result.get("message", "Opening Cursor"))
-        elif "open browser" in command_lower:
-            result = self.actions.open_browser()
-            self.voice.speak(result.get("message", "Opening browser"))
-        elif "what time" in command_lower:
-            result = self.actions.get_time()
-            self.voice.speak(result.get("message", "I don't know the time"))
-        else:
-            self.voice.speak("I'm not sure how to help with that")
+        Expects the already-lowercased text returned by the voice interface.
+        """
+        tokens = set(re.findall(r"\w+", command))
+        
+        for keywords, action, default_message in self._keyword_map:
+            if all(k in tokens for k in keywords):
+                result = action()
+                self.voice.speak(result.get("message", default_message))
+                return
+        
+        self.voice.speak("I'm not sure how to help with that")
     
     def run(self):
         """Start the Jarvis assistant."""
@@ -139,10 +166,12 @@ class JarvisAssistant:
         except KeyboardInterrupt:
             print("\n\nShutting down Jarvis...")
             self.voice.speak("Goodbye")
+            self.executor.shutdown(wait=True)
             self.voice.cleanup()
             sys.exit(0)
         except Exception as e:
             print(f"Fatal error: {e}")
+            self.executor.shutdown(wait=True)
             self.voice.cleanup()
             sys.exit(1)
 
@@ -5,7 +5,10 @@ Handles conversation memory and vector storage using Chroma
 
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
 import os
+import uuid
+from collections import OrderedDict, deque
 from datetime import datetime
 from typing import List, Dict, Optional
 import json
@@ -25,40 +28,115 @@ class MemoryLayer:
             settings=Settings(anonymized_telemetry=False)
         )
         
-        # Get or create collections
-        self.conversation_collection = self.client.get_or_create_collection(
-            name="conversations",
-            metadata={"hnsw:space": "cosine"}
-        )
+        # ONNX Runtime embeddings on CPU, keeping the GPU free for Whisper and vLLM.
+        # Held directly so query embeddings can be cached
+        self.embedding_function = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+        
+        # Single collection for conversations ("conv") and memories ("mem"),
+        # distinguished by the "type" metadata field
+        self.collection = self._get_or_create_collection("memory")
+        self._migrate_legacy_collections()
+        
+        # In-process caches: most recent turns and query embeddings (LRU)
+        self._recent_cache = deque(maxlen=10)
+        self._query_cache = OrderedDict()
+        self._query_cache_size = 128
+        self._load_recent_cache()
+    
+    def _get_or_create_collection(self, name: str):
+        """Open a collection, creating it with explicit embedding and HNSW settings if new.
         
-        self.memory_collection = self.client.get_or_create_collection(
-            name="memories",
-            metadata={"hnsw:space": "cosine"}
+        Existing collections are opened with the embedding function persisted in
+        their configuration; Chroma rejects reopening them with a different one.
+        """
+        existing = {collection.name for collection in self.client.list_collections()}
+        if name in existing:
+            return self.client.get_collection(name)
+        
+        return self.client.create_collection(
+            name=name,
+            metadata={
+                "hnsw:space": "cosine",
+                "hnsw:construction_ef": 100,
+                "hnsw:M": 16
+            },
+            embedding_function=self.embedding_function
         )
     
+    def _migrate_legacy_collections(self):
+        """Move entries from the old per-type collections into the merged collection."""
+        existing = {collection.name for collection in self.client.list_collections()}
+        for name, entry_type in (("conversations", "conv"), ("memories", "mem")):
+            if name not in existing:
+                continue
+            
+            legacy = self.client.get_collection(name)
+            results = legacy.get(include=["documents", "metadatas", "embeddings"])
+            if results["ids"]:
+                # upsert keeps this safe to re-run if a previous migration was interrupted
+                self.collection.upsert(
+                    ids=results["ids"],
+                    documents=results["documents"],
+                    embeddings=results["embeddings"],
+                    metadatas=[{**(m or {}), "type": entry_type} for m in results["metadatas"]]
+                )
+            self.client.delete_collection(name)
+    
+    def _load_recent_cache(self):
+        """Seed the recent conversation cache from persisted conversations."""
+        results = self.collection.get(where={"type": "conv"}, include=["metadatas"])
+        metadatas = sorted(results["metadatas"], key=lambda m: m.get("timestamp", ""))
+        for metadata in metadatas[-self._recent_cache.maxlen:]:
+            self._recent_cache.append({
+                "user_input": metadata.get("user_input", ""),
+                "assistant_response": metadata.get("assistant_response", ""),
+                "timestamp": metadata.get("timestamp", "")
+            })
+    
+    def _embed_query(self, query: str):
+        """Embed a query, reusing the cached embedding for repeated queries."""
+        embedding = self._query_cache.get(query)
+        if embedding is not None:
+            self._query_cache.move_to_end(query)
+            return embedding
+        
+        embedding = self.embedding_function([query])[0]
+        self._query_cache[query] = embedding
+        if len(self._query_cache) > self._query_cache_size:
+            self._query_cache.popitem(last=False)
+        return embedding
+    
     def add_conversation(self, user_input: str, assistant_response: str, metadata: Optional[Dict] = None):
         """Add a conversation turn to memory."""
         timestamp = datetime.now().isoformat()
         conversation_text = f"User: {user_input}\nAssistant: {assistant_response}"
         
-        # Generate ID
-        conversation_id = f"conv_{datetime.now().timestamp()}"
+        # Generate ID (uuid4 avoids collisions between rapid sequential adds)
+        conversation_id = f"conv_{uuid.uuid4().hex}"
         
         # Store in Chroma
-        self.conversation_collection.add(
+        self.collection.add(
             ids=[conversation_id],
             documents=[conversation_text],
             metadatas=[{
+                "type": "conv",
                 "timestamp": timestamp,
                 "user_input": user_input,
                 "assistant_response": assistant_response,
                 **(metadata or {})
             }]
         )
+        
+        self._recent_cache.append({
+            "user_input": user_input,
+            "assistant_response": assistant_response,
+            "timestamp": timestamp
+        })
     
     def get_recent_conversations(self, limit: int = 5) -> List[Dict]:
         """Get recent conversations for context."""
-        results = self.conversation_collection.get(
+        results = self.collection.get(
+            where={"type": "conv"},
             limit=limit,
             include=["documents", "metadatas"]
         )
@@ -75,9 +153,10 @@ class MemoryLayer:
     
     def search_similar_conversations(self, query: str, limit: int = 3) -> List[Dict]:
         """Search for similar past conversations."""
-        results = self.conversation_collection.query(
-            query_texts=[query],
+        results = self.collection.query(
+            query_embeddings=[self._embed_query(query)],
             n_results=limit,
+            where={"type": "conv"},
             include=["documents", "metadatas", "distances"]
         )
         
@@ -94,20 +173,22 @@ class MemoryLayer:
     
     def add_memory(self, memory_text: str, category: str = "general"):
         """Add a persistent memory."""
-        memory_id = f"mem_{datetime.now().timestamp()}"
-        self.memory_collection.add(
+        timestamp = datetime.now().isoformat()
+        memory_id = f"mem_{uuid.uuid4().hex}"
+        self.collection.add(
             ids=[memory_id],
             documents=[memory_text],
             metadatas={
+                "type": "mem",
                 "category": category,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": timestamp
             }
         )
     
     def get_context_for_llm(self, current_query: str, max_conversations: int = 3) -> str:
         """Get relevant context for LLM prompt."""
-        # Get recent conversations
-        recent = self.get_recent_conversations(limit=max_conversations)
+        # Get recent conversations from the in-process cache
+        recent = list(self._recent_cache)[-max_conversations:]
         
         # Search for similar conversations
         similar = self.search_similar_conversations(current_query, limit=2)
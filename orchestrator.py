@@ -3,6 +3,7 @@ Orchestrator Layer
 Coordinates between LLM, Memory, and System Actions
 """
 
+from concurrent.futures import Executor, Future
 from typing import Dict, Optional
 import json
 import re
@@ -11,22 +12,27 @@ from system_actions import SystemActions
 from vllm import SamplingParams
 
 
+_ACTION_RE = re.compile(r'action:\s*(\w+)', re.IGNORECASE)
+_JSON_DEC = json.JSONDecoder()
+
+
 class ActionOutputParser:
     """Parse LLM output to extract actions."""
     
     def parse(self, text: str) -> Dict:
         """Parse LLM response to extract action and parameters."""
-        # Look for JSON action format
-        json_match = re.search(r'\{[^}]+\}', text)
-        if json_match:
+        # Look for JSON action format (raw_decode handles nested objects)
+        start = text.find('{')
+        if start >= 0:
             try:
-                action_data = json.loads(json_match.group())
-                return action_data
-            except:
+                action_data, _ = _JSON_DEC.raw_decode(text, start)
+                if isinstance(action_data, dict):
+                    return action_data
+            except ValueError:
                 pass
         
         # Look for action: format
-        action_match = re.search(r'action:\s*(\w+)', text, re.IGNORECASE)
+        action_match = _ACTION_RE.search(text)
         if action_match:
             return {
                 "action": action_match.group(1),
@@ -43,18 +49,38 @@ class ActionOutputParser:
 class Orchestrator:
     """Orchestrates interactions between LLM, Memory, and System Actions."""
     
-    def __init__(self, llm, memory_layer: MemoryLayer, system_actions: SystemActions):
-        """Initialize orchestrator."""
+    def __init__(self, llm, memory_layer: MemoryLayer, system_actions: SystemActions,
+                 executor: Optional[Executor] = None):
+        """Initialize orchestrator.
+        
+        If an executor is given, memory writes run on it so they overlap with TTS.
+        """
         self.llm = llm
         self.memory = memory_layer
         self.actions = system_actions
+        self.executor = executor
         self.output_parser = ActionOutputParser()
         
-        # Sampling parameters for vLLM
+        # Static system prompt, kept byte-identical across turns so vLLM's
+        # prefix cache can skip prefill for it
+        available_actions = ", ".join(self.actions.actions.keys())
+        self.system_prompt = f"""You are Jarvis, a helpful AI assistant. You have access to system actions and conversation history.
+
+Available system actions: {available_actions}
+
+Respond naturally. If you need to perform a system action, respond in JSON format:
+{{"action": "action_name", "parameters": {{"param": "value"}}, "response": "what to say to user"}}
+
+If no action is needed, just respond normally."""
+        
+        # Sampling parameters for vLLM; responses are short spoken replies or a
+        # single JSON action, so cap decode length. The chat template's EOS token
+        # already ends the turn; the stop string catches a hallucinated next user turn.
         self.sampling_params = SamplingParams(
             temperature=0.7,
             top_p=0.95,
-            max_tokens=256
+            max_tokens=160,
+            stop=["\nUser:"]
         )
     
     def process_query(self, user_input: str) -> Dict:
@@ -69,27 +95,14 @@ class Orchestrator:
         # Get context from memory
         context = self.memory.get_context_for_llm(user_input)
         
-        # Get available actions
-        available_actions = ", ".join(self.actions.actions.keys())
+        # Static system prompt first, per-turn context and query last
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"{context}\nUser: {user_input}"},
+        ]
         
-        # Create prompt
-        prompt = f"""You are Jarvis, a helpful AI assistant. You have access to system actions and conversation history.
-
-Available system actions: {available_actions}
-
-Previous conversation context:
-{context}
-
-User: {user_input}
-
-Assistant: Respond naturally. If you need to perform a system action, respond in JSON format:
-{{"action": "action_name", "parameters": {{"param": "value"}}, "response": "what to say to user"}}
-
-If no action is needed, just respond normally.
-"""
-        
-        # Generate response using vLLM
-        outputs = self.llm.generate([prompt], self.sampling_params)
+        # Generate response using vLLM (applies Qwen's chat template)
+        outputs = self.llm.chat(messages, self.sampling_params)
         response_text = outputs[0].outputs[0].text.strip()
         
         # Parse response
@@ -111,12 +124,22 @@ If no action is needed, just respond normally.
         else:
             final_response = response_text
         
-        # Store in memory
-        self.memory.add_conversation(user_input, final_response)
+        # Store in memory (in the background when an executor is available)
+        if self.executor:
+            future = self.executor.submit(self.memory.add_conversation, user_input, final_response)
+            future.add_done_callback(self._report_memory_error)
+        else:
+            self.memory.add_conversation(user_input, final_response)
         
         return {
             "response": final_response,
             "action": parsed.get("action"),
             "action_result": action_result
         }
-
+    
+    @staticmethod
+    def _report_memory_error(future: Future):
+        """Report errors from background memory writes."""
+        error = future.exception()
+        if error:
+            print(f"Error storing conversation: {error}")
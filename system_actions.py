@@ -5,11 +5,17 @@ Handles OS, Browser, IoT, Email, and other system interactions
 
 import subprocess
 import os
+import shutil
 import webbrowser
+from datetime import datetime
 from typing import Dict, Callable, Optional
 import json
 
 
+_TIME_FMT = "%I:%M %p"
+_DATE_FMT = "%A, %B %d, %Y"
+
+
 class SystemActions:
     """Handles system-level actions and integrations."""
     
@@ -24,6 +30,14 @@ class SystemActions:
             "list_files": self.list_files,
             "run_command": self.run_command,
         }
+        
+        # Resolve browser and terminal once instead of probing on every call
+        self._browser = next(
+            (b for b in ("firefox", "chrome", "chromium", "brave") if shutil.which(b)), None
+        )
+        self._terminal = next(
+            (t for t in ("gnome-terminal", "konsole", "xterm", "alacritty") if shutil.which(t)), None
+        )
     
     def open_cursor(self, **kwargs) -> Dict:
         """Open Cursor editor."""
@@ -43,51 +57,40 @@ class SystemActions:
             if url:
                 webbrowser.open(url)
                 return {"success": True, "message": f"Opened {url}"}
+            elif self._browser:
+                subprocess.Popen(
+                    [self._browser],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+                return {"success": True, "message": f"Opened {self._browser}"}
             else:
-                # Try to open default browser
-                browsers = ["firefox", "chrome", "chromium", "brave"]
-                for browser in browsers:
-                    try:
-                        subprocess.Popen(
-                            [browser],
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL
-                        )
-                        return {"success": True, "message": f"Opened {browser}"}
-                    except FileNotFoundError:
-                        continue
                 return {"success": False, "message": "No browser found"}
         except Exception as e:
             return {"success": False, "message": f"Failed to open browser: {e}"}
     
     def open_terminal(self, **kwargs) -> Dict:
         """Open terminal."""
-        try:
-            terminals = ["gnome-terminal", "konsole", "xterm", "alacritty"]
-            for term in terminals:
-                try:
-                    subprocess.Popen(
-                        [term],
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL
-                    )
-                    return {"success": True, "message": f"Opened {term}"}
-                except FileNotFoundError:
-                    continue
+        if not self._terminal:
             return {"success": False, "message": "No terminal found"}
+        try:
+            subprocess.Popen(
+                [self._terminal],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            return {"success": True, "message": f"Opened {self._terminal}"}
         except Exception as e:
             return {"success": False, "message": f"Failed to open terminal: {e}"}
     
     def get_time(self, **kwargs) -> Dict:
         """Get current time."""
-        from datetime import datetime
-        current_time = datetime.now().strftime("%I:%M %p")
+        current_time = datetime.now().strftime(_TIME_FMT)
         return {"success": True, "message": f"The time is {current_time}", "data": current_time}
     
     def get_date(self, **kwargs) -> Dict:
         """Get current date."""
-        from datetime import datetime
-        current_date = datetime.now().strftime("%A, %B %d, %Y")
+        current_date = datetime.now().strftime(_DATE_FMT)
         return {"success": True, "message": f"Today is {current_date}", "data": current_date}
     
     def list_files(self, directory: Optional[str] = None, **kwargs) -> Dict:
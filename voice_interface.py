@@ -1,17 +1,23 @@
 """
 Voice Interface Layer
-Handles ASR (Whisper) and TTS (Piper)
+Handles wake word detection (openWakeWord), ASR (faster-whisper) and TTS (Piper)
 """
 
-import whisper
+from faster_whisper import WhisperModel
+from openwakeword.model import Model as WakeWordModel
+from openwakeword.utils import download_models as download_wakeword_models
 import pyaudio
-import wave
+import webrtcvad
 import numpy as np
+import collections
+import json
 import threading
-import queue
-import os
+import shutil
 import subprocess
-import tempfile
+
+
+# Used when a Piper voice's config can't be read (rate of medium-quality voices)
+_PIPER_DEFAULT_SAMPLE_RATE = 22050
 
 
 class VoiceInterface:
@@ -20,12 +26,14 @@ class VoiceInterface:
     def __init__(self, wake_word="hey jarvis"):
         """Initialize voice interface with Whisper and Piper."""
         self.wake_word = wake_word.lower()
-        self.audio_queue = queue.Queue()
-        self.is_listening = False
         
-        # Initialize Whisper model
+        # Initialize Whisper model (CTranslate2 INT8 weights, FP16 activations)
         print("Loading Whisper model...")
-        self.whisper_model = whisper.load_model("base")  # Use 'base' for speed, 'small' for accuracy
+        self.whisper_model = WhisperModel(
+            "base.en",  # Use 'base.en' for speed, 'small.en' for accuracy
+            device="cuda",
+            compute_type="int8_float16"
+        )
         print("Whisper model loaded")
         
         # Audio settings
@@ -34,93 +42,159 @@ class VoiceInterface:
         self.channels = 1
         self.rate = 16000
         self.audio = pyaudio.PyAudio()
+        self.frame_bytes = self.channels * self.audio.get_sample_size(self.format)
+        
+        # Single input stream reused for wake word detection and recording
+        self._stream = self.audio.open(
+            format=self.format,
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            frames_per_buffer=self.chunk
+        )
+        self._stream.start_stream()
+        
+        # Initialize wake word detector (small CPU model, Whisper only runs after detection)
+        # Pretrained models aren't shipped with the package; this is a no-op once downloaded
+        print("Loading wake word model...")
+        wakeword_name = self.wake_word.replace(" ", "_")
+        download_wakeword_models([wakeword_name])
+        self.wakeword_model = WakeWordModel(
+            wakeword_models=[wakeword_name],
+            inference_framework="onnx"  # tflite-runtime has no Python 3.13 wheels
+        )
+        self.wakeword_frame = 1280  # 80ms at 16kHz, the frame size openWakeWord expects
+        self.wakeword_threshold = 0.5
+        print("Wake word model loaded")
+        
+        # Voice activity detection for command capture
+        self.vad = webrtcvad.Vad(2)
+        self.vad_frame_ms = 20
+        self.vad_speech_start_ms = 200  # Speech needed before capture starts
+        self.vad_silence_end_ms = 500  # Silence needed before capture stops
         
         # Check for Piper TTS
         self.piper_available = self._check_piper()
+        
+        # Use first available voice; raw PCM has no header, so aplay needs its real rate
+        self.piper_voice = self.piper_voices[0].split()[0] if self.piper_voices else "en_US-lessac-medium"
+        self.piper_sample_rate = self._read_piper_sample_rate(self.piper_voice)
     
     def _check_piper(self):
         """Check if Piper TTS CLI is available with voices."""
-        # Check for CLI piper
-        try:
-            result = subprocess.run(
-                ["which", "piper"],
-                capture_output=True,
-                text=True,
-                timeout=1
-            )
-            if result.returncode == 0:
-                # Try to list voices to see if any are installed
-                try:
-                    result = subprocess.run(
-                        ["piper", "--list-voices"],
-                        capture_output=True,
-                        text=True,
-                        timeout=2
-                    )
-                    if result.returncode == 0 and result.stdout and len(result.stdout.strip()) > 0:
-                        self.piper_voices = result.stdout.strip().split('\n')
-                        return True
-                except:
-                    pass
-        except:
-            pass
+        # Check for CLI piper without spawning `which`
+        if shutil.which("piper"):
+            # Try to list voices to see if any are installed
+            try:
+                result = subprocess.run(
+                    ["piper", "--list-voices"],
+                    capture_output=True,
+                    text=True,
+                    timeout=2
+                )
+                if result.returncode == 0 and result.stdout and len(result.stdout.strip()) > 0:
+                    self.piper_voices = result.stdout.strip().split('\n')
+                    return True
+            except:
+                pass
         
         self.piper_voices = []
         return False
     
-    def record_audio(self, duration=5):
-        """Record audio from microphone."""
-        stream = self.audio.open(
-            format=self.format,
-            channels=self.channels,
-            rate=self.rate,
-            input=True,
-            frames_per_buffer=self.chunk
-        )
+    def _read_piper_sample_rate(self, voice):
+        """Read the output sample rate from a Piper voice's .onnx.json config."""
+        model_path = voice if voice.endswith(".onnx") else f"{voice}.onnx"
+        try:
+            with open(f"{model_path}.json") as f:
+                return int(json.load(f)["audio"]["sample_rate"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return _PIPER_DEFAULT_SAMPLE_RATE
+    
+    def _drain_stream(self):
+        """Discard audio buffered on the input stream so recording starts from now."""
+        available = self._stream.get_read_available()
+        if available:
+            self._stream.read(available, exception_on_overflow=False)
+    
+    def record_until_silence(self, max_duration=5):
+        """Record from microphone while speech is detected, stopping on silence."""
+        frame_samples = self.rate * self.vad_frame_ms // 1000
+        start_frames = self.vad_speech_start_ms // self.vad_frame_ms
+        end_frames = self.vad_silence_end_ms // self.vad_frame_ms
+        max_frames = max_duration * 1000 // self.vad_frame_ms
+        frame_bytes = frame_samples * self.frame_bytes
         
-        frames = []
-        for _ in range(0, int(self.rate / self.chunk * duration)):
-            data = stream.read(self.chunk)
-            frames.append(data)
+        self._drain_stream()
         
-        stream.stop_stream()
-        stream.close()
+        # Ring buffer keeps the onset of speech that triggered capture;
+        # captured frames go into a buffer preallocated for max_duration
+        ring = collections.deque(maxlen=start_frames)
+        buf = bytearray(max_frames * frame_bytes)
+        mv = memoryview(buf)
+        offset = 0
+        triggered = False
+        speech_run = 0
+        silence_run = 0
+        
+        for _ in range(max_frames):
+            frame = self._stream.read(frame_samples, exception_on_overflow=False)
+            is_speech = self.vad.is_speech(frame, self.rate)
+            
+            if not triggered:
+                ring.append(frame)
+                speech_run = speech_run + 1 if is_speech else 0
+                if speech_run >= start_frames:
+                    triggered = True
+                    for onset_frame in ring:
+                        mv[offset:offset + frame_bytes] = onset_frame
+                        offset += frame_bytes
+                    ring.clear()
+            else:
+                mv[offset:offset + frame_bytes] = frame
+                offset += frame_bytes
+                silence_run = 0 if is_speech else silence_run + 1
+                if silence_run >= end_frames:
+                    break
         
-        return b''.join(frames)
+        mv.release()
+        del buf[offset:]
+        return buf
     
     def transcribe_audio(self, audio_data):
-        """Transcribe audio using Whisper."""
-        # Save audio to temporary file
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-            tmp_path = tmp_file.name
-            with wave.open(tmp_path, 'wb') as wf:
-                wf.setnchannels(self.channels)
-                wf.setsampwidth(self.audio.get_sample_size(self.format))
-                wf.setframerate(self.rate)
-                wf.writeframes(audio_data)
-            
-            try:
-                result = self.whisper_model.transcribe(tmp_path, language="en")
-                text = result["text"].strip().lower()
-                return text
-            finally:
-                os.unlink(tmp_path)
+        """Transcribe audio using faster-whisper."""
+        # Convert 16-bit PCM to float32 in [-1, 1] in memory (no temp WAV file)
+        audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32)
+        audio_np *= 1.0 / 32768.0
+        
+        segments, _ = self.whisper_model.transcribe(
+            audio_np,
+            language="en",
+            beam_size=1,
+            vad_filter=True
+        )
+        text = "".join(segment.text for segment in segments).strip().lower()
+        return text
     
     def listen_for_wake_word(self, callback):
         """Continuously listen for wake word."""
         print(f"Listening for wake word: '{self.wake_word}'")
         
+        self._drain_stream()
+        
         while True:
             try:
-                # Record short audio chunks
-                audio_data = self.record_audio(duration=3)
-                text = self.transcribe_audio(audio_data)
+                frame = self._stream.read(self.wakeword_frame, exception_on_overflow=False)
+                prediction = self.wakeword_model.predict(np.frombuffer(frame, dtype=np.int16))
+                score = max(prediction.values())
                 
-                if text and self.wake_word in text:
-                    print(f"Wake word detected! Heard: {text}")
-                    callback()
-                else:
-                    print(f"Heard: {text}" if text else "Listening...")
+                if score > self.wakeword_threshold:
+                    print(f"Wake word detected! (score: {score:.2f})")
+                    try:
+                        callback()
+                    finally:
+                        # Start fresh: drop model state and audio buffered during the callback
+                        self.wakeword_model.reset()
+                        self._drain_stream()
                     
             except KeyboardInterrupt:
                 break
@@ -130,7 +204,10 @@ class VoiceInterface:
     def listen_for_command(self, duration=5):
         """Listen for a voice command."""
         print("Listening for command...")
-        audio_data = self.record_audio(duration=duration)
+        audio_data = self.record_until_silence(max_duration=duration)
+        if not audio_data:
+            # No speech detected, skip Whisper entirely
+            return ""
         text = self.transcribe_audio(audio_data)
         return text
     
@@ -141,45 +218,69 @@ class VoiceInterface:
         # Try Piper CLI if available
         if self.piper_available and hasattr(self, 'piper_voices') and self.piper_voices:
             try:
-                # Use first available voice
-                voice = self.piper_voices[0].split()[0] if self.piper_voices else "en_US-lessac-medium"
-                
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                    output_path = tmp_file.name
-                
-                result = subprocess.run(
-                    ["piper", "--model", voice, "--output_file", output_path],
-                    input=text.encode(),
-                    capture_output=True,
-                    timeout=10
-                )
+                # Stream raw PCM into aplay so playback starts during synthesis
+                if self._stream_piper(["--model", self.piper_voice], text, self.piper_sample_rate):
+                    return
                 
-                if result.returncode == 0 and os.path.exists(output_path):
-                    # Play the audio
-                    subprocess.run(["aplay", output_path], check=True, timeout=5)
-                    os.unlink(output_path)
+                # If specific voice failed, try without specifying (uses default)
+                if self._stream_piper([], text, _PIPER_DEFAULT_SAMPLE_RATE):
                     return
-                else:
-                    # If specific voice failed, try without specifying (uses default)
-                    try:
-                        result = subprocess.run(
-                            ["piper", "--output_file", output_path],
-                            input=text.encode(),
-                            capture_output=True,
-                            timeout=10
-                        )
-                        if result.returncode == 0 and os.path.exists(output_path):
-                            subprocess.run(["aplay", output_path], check=True, timeout=5)
-                            os.unlink(output_path)
-                            return
-                    except:
-                        pass
             except Exception as e:
                 print(f"Piper TTS error: {e}")
         
         # Fallback to espeak (more reliable)
         self._fallback_tts(text)
     
+    def _stream_piper(self, piper_args, text, sample_rate):
+        """Pipe Piper's raw audio output directly into aplay.
+        
+        Returns True if the text was spoken, False if nothing could be played.
+        """
+        piper = subprocess.Popen(
+            ["piper", *piper_args, "--output-raw"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            aplay = subprocess.Popen(
+                ["aplay", "-r", str(sample_rate), "-f", "S16_LE", "-t", "raw", "-c", "1"],
+                stdin=piper.stdout,
+                stderr=subprocess.DEVNULL
+            )
+        except OSError:
+            piper.kill()
+            piper.wait()
+            return False
+        finally:
+            piper.stdout.close()  # aplay owns the read end now
+        
+        try:
+            piper.stdin.write(text.encode())
+            piper.stdin.close()
+            # Piper blocks on the pipe while aplay plays, so wait on playback first.
+            # Speech runs ~15 chars/sec; allow a third of that plus startup time so
+            # long replies are never cut off by the timeout.
+            aplay.wait(timeout=10 + len(text) / 5)
+            piper.wait(timeout=5)
+        except BrokenPipeError:
+            # Piper exited before reading the text, so nothing was played
+            self._kill_processes(piper, aplay)
+            return False
+        except subprocess.TimeoutExpired:
+            # Piper or aplay hung; stop rather than repeating the reply in a fallback
+            self._kill_processes(piper, aplay)
+            return True
+        
+        return piper.returncode == 0 and aplay.returncode == 0
+    
+    @staticmethod
+    def _kill_processes(*processes):
+        """Kill and reap subprocesses."""
+        for process in processes:
+            process.kill()
+            process.wait()
+    
     def _fallback_tts(self, text):
         """Fallback TTS using espeak, festival, or spd-say."""
         # Try espeak first (most common on Linux)
@@ -221,5 +322,7 @@ class VoiceInterface:
     
     def cleanup(self):
         """Clean up audio resources."""
+        self._stream.stop_stream()
+        self._stream.close()
         self.audio.terminate()
 